@@ -0,0 +1,93 @@
+"""Benchmark gate time calculation over 180 days of half-hour tide heights.
+
+Compares the original per-sample loop, which re-parsed every ISO timestamp,
+with the vectorised ``calculate_gate_times`` in ``mcp_api``.
+
+    python benchmarks/gate_times.py
+"""
+import math
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mcp_api import (  # noqa: E402
+    GATE_OPEN_HEIGHT,
+    TZ,
+    TideSeries,
+    app,
+    calculate_gate_times,
+    to_local,
+)
+
+DAYS = 180
+STEP = 1800
+M2 = 12.4206012 * 3600
+S2 = 12.0 * 3600
+
+
+def synthetic_heights(days: int = DAYS):
+    """Half-hourly heights from a simple M2 + S2 tide."""
+    start = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+    ts = np.arange(start, start + days * 86400, STEP, dtype=np.int64)
+    t = ts - start
+    heights = 4.4 + 3.0 * np.cos(2 * math.pi * t / M2) + 0.9 * np.cos(2 * math.pi * t / S2)
+    return ts, heights
+
+
+def legacy_gate_times(entries: list, threshold: float) -> dict:
+    """The loop ``calculate_gate_times`` used before it was vectorised."""
+    events: dict[str, list] = {}
+    prev_dt: Optional[datetime] = None
+    prev_height: Optional[float] = None
+    for entry in entries:
+        dt = datetime.fromisoformat(entry["dt"]).astimezone(TZ)
+        height = entry["height"]
+        if prev_dt is not None and prev_height is not None:
+            if prev_height < threshold <= height:
+                ratio = (threshold - prev_height) / (height - prev_height)
+                crossing = prev_dt + (dt - prev_dt) * ratio
+                events.setdefault(crossing.strftime("%Y-%m-%d"), []).append(
+                    {"datetime": crossing.isoformat(), "action": "lower", "height": threshold}
+                )
+            elif prev_height > threshold >= height:
+                ratio = (prev_height - threshold) / (prev_height - height)
+                crossing = prev_dt + (dt - prev_dt) * ratio
+                events.setdefault(crossing.strftime("%Y-%m-%d"), []).append(
+                    {"datetime": crossing.isoformat(), "action": "raise", "height": threshold}
+                )
+        prev_dt = dt
+        prev_height = height
+    return events
+
+
+def main(repeat: int = 20):
+    ts, heights = synthetic_heights()
+    entries = []
+    for t, h in zip(ts.tolist(), heights.tolist()):
+        dt_local = to_local(t)
+        entries.append({"dt": dt_local.isoformat(), "date": dt_local.strftime("%Y-%m-%d"), "height": h})
+    app.state.tide_heights_cache = TideSeries(ts, heights)
+
+    legacy = legacy_gate_times(entries, GATE_OPEN_HEIGHT)
+    calculate_gate_times()
+    current = app.state.gate_times
+    old_times = [datetime.fromisoformat(e["datetime"]) for d in legacy.values() for e in d]
+    new_times = [datetime.fromisoformat(e["datetime"]) for d in current.values() for e in d]
+    assert len(old_times) == len(new_times), "crossing counts differ"
+    drift = max(abs((a - b).total_seconds()) for a, b in zip(old_times, new_times))
+
+    t_legacy = min(timeit.repeat(lambda: legacy_gate_times(entries, GATE_OPEN_HEIGHT), number=1, repeat=repeat))
+    t_current = min(timeit.repeat(calculate_gate_times, number=1, repeat=repeat))
+    print(f"{len(entries)} samples, {len(new_times)} crossings, max difference {drift:.6f}s")
+    print(f"legacy loop:  {t_legacy * 1000:8.2f} ms")
+    print(f"vectorised:   {t_current * 1000:8.2f} ms  ({t_legacy / t_current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Compare the gate crossing interpolation methods for accuracy and cost.
+
+By default a synthetic year of Conwy-like tide is sampled every 30 minutes,
+and the crossings found by each method are compared with exact crossings
+from a dense version of the same curve.
+
+Given WorldTides heights for the period of ``GateTimes2025.pdf`` and the CSV
+written by ``extract_gate_times.py``, the predictions are also compared with
+the published gate times:
+
+    python benchmarks/interpolation.py --heights heights2025.json --csv gate_times.csv
+
+``--heights`` takes a saved WorldTides ``heights`` response (or just its
+``heights`` list) with epoch ``dt`` values and heights relative to chart
+datum.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mcp_api import GATE_OPEN_HEIGHT, TZ, CrossingIndex  # noqa: E402
+
+METHODS = ("linear", "cubic", "cosine")
+STEP = 1800
+# Approximate amplitudes (m) and periods (hours) for Liverpool Bay.
+CONSTITUENTS = [
+    (3.00, 12.4206012, 0.0),  # M2
+    (0.95, 12.0, 1.1),  # S2
+    (0.56, 12.6583482, 2.3),  # N2
+    (0.27, 11.9672348, 1.4),  # K2
+    (0.11, 23.9344697, 0.6),  # K1
+    (0.11, 25.8193417, 2.9),  # O1
+    (0.12, 6.2103006, 0.8),  # M4
+    (0.08, 6.1033393, 1.9),  # MS4
+]
+
+
+def synthetic_tide(t: np.ndarray) -> np.ndarray:
+    h = np.full(t.shape, 4.4)
+    for amp, period, phase in CONSTITUENTS:
+        h += amp * np.cos(2 * math.pi * t / (period * 3600) + phase)
+    return h
+
+
+def errors_minutes(predicted: np.ndarray, truth: np.ndarray) -> np.ndarray:
+    nearest = np.clip(np.searchsorted(truth, predicted), 1, len(truth) - 1)
+    err = np.minimum(abs(predicted - truth[nearest - 1]), abs(predicted - truth[nearest]))
+    return err / 60
+
+
+def synthetic_accuracy(days: int = 365):
+    start = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+    ts = np.arange(start, start + days * 86400, STEP, dtype=np.int64)
+    index = CrossingIndex(ts, synthetic_tide(ts - start).astype(np.float32))
+
+    dense_ts = np.arange(start, start + days * 86400, 20, dtype=np.int64)
+    truth, _ = CrossingIndex(dense_ts, synthetic_tide(dense_ts - start)).crossings(
+        GATE_OPEN_HEIGHT, "linear"
+    )
+
+    print(f"Synthetic tide, {days} days at {STEP // 60}-minute samples, threshold {GATE_OPEN_HEIGHT} m")
+    print(f"{'method':8} {'mean':>8} {'p95':>8} {'max':>8}   cost/year")
+    build = min(timeit.repeat(lambda: CrossingIndex(index.ts, index.heights), number=1, repeat=5))
+    for method in METHODS:
+        times, _ = index.crossings(GATE_OPEN_HEIGHT, method)
+        err = errors_minutes(times, truth)
+        cost = min(timeit.repeat(lambda: index.crossings(GATE_OPEN_HEIGHT, method), number=1, repeat=10))
+        print(
+            f"{method:8} {err.mean():7.2f}m {np.percentile(err, 95):7.2f}m {err.max():7.2f}m"
+            f"   {(build + cost) * 1000:6.2f} ms"
+        )
+
+
+def load_pdf_times(path: str, year: int) -> dict:
+    """Read ``gate_times.csv`` into sorted epoch arrays per action."""
+    events = {"lower": [], "raise": []}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            month = datetime.strptime(row["month"], "%B").month
+            hour, minute = map(int, row["time"].split(":"))
+            local = datetime(year, month, int(row["day"]), hour, minute, tzinfo=TZ)
+            events[row["action"].lower()].append(local.timestamp())
+    return {k: np.sort(np.array(v)) for k, v in events.items()}
+
+
+def pdf_accuracy(heights_path: str, csv_path: str, year: int):
+    with open(heights_path) as f:
+        data = json.load(f)
+    heights = data["heights"] if isinstance(data, dict) else data
+    ts = np.array([h["dt"] for h in heights], dtype=np.int64)
+    index = CrossingIndex(ts, np.array([h["height"] for h in heights], dtype=np.float32))
+    published = load_pdf_times(csv_path, year)
+
+    print(f"\nAgainst {csv_path} ({year}), threshold {GATE_OPEN_HEIGHT} m")
+    print(f"{'method':8} {'matched':>8} {'mean':>8} {'p95':>8}")
+    for method in METHODS:
+        times, rising = index.crossings(GATE_OPEN_HEIGHT, method)
+        err = []
+        for action, predicted in (("lower", times[rising]), ("raise", times[~rising])):
+            pub = published[action]
+            pub = pub[(pub >= ts[0]) & (pub <= ts[-1])]
+            if len(pub) and len(predicted) > 1:
+                err.append(errors_minutes(pub, predicted))
+        err = np.concatenate(err) if err else np.empty(0)
+        # Published times more than 90 minutes from any prediction are
+        # unmatched events (e.g. a tide only just reaching the threshold).
+        err = err[err <= 90]
+        if len(err):
+            print(f"{method:8} {len(err):8d} {err.mean():7.2f}m {np.percentile(err, 95):7.2f}m")
+        else:
+            print(f"{method:8} {0:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--heights", help="WorldTides heights JSON covering the PDF year")
+    parser.add_argument("--csv", default="gate_times.csv", help="CSV from extract_gate_times.py")
+    parser.add_argument("--year", type=int, default=2025)
+    args = parser.parse_args()
+
+    synthetic_accuracy()
+    if args.heights:
+        pdf_accuracy(args.heights, args.csv, args.year)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare OCR profiles for speed and accuracy on the gate time PDF.
+
+Every page is rasterized and OCR'd with each profile in ``PROFILES`` (the
+text layer and OCR cache are bypassed), and the records are scored against
+a known-good CSV, such as a hand-checked ``gate_times.csv``:
+
+    python benchmarks/ocr.py --truth gate_times_checked.csv
+    python benchmarks/ocr.py --profiles table --dpi 150 200 300 --pages 1
+
+A record is correct if the same month, day, time and action appears in the
+known-good CSV. A day is correct if all of its records are.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pdf2image import convert_from_path  # noqa: E402
+
+from extract_gate_times import (  # noqa: E402
+    PROFILES,
+    column_box,
+    page_sizes,
+    page_tables,
+    parse_section,
+)
+
+
+def load_records(path: str) -> list:
+    with open(path, newline="") as f:
+        return [(r["month"], int(r["day"]), r["time"], r["action"]) for r in csv.DictReader(f)]
+
+
+def run_profile(pdf_path: str, profile: dict, dpi: int, pages: int) -> tuple:
+    """OCR the first ``pages`` pages; return records and per-page timings."""
+    records, timings = [], []
+    for index in range(pages):
+        n = index + 1
+        start = time.perf_counter()
+        page, = convert_from_path(pdf_path, dpi=dpi, first_page=n, last_page=n, grayscale=True)
+        rasterized = time.perf_counter()
+        for name, start_day, days, col in page_tables(index):
+            crop = page.crop(column_box(col, *page.size))
+            records += [(name, d, t, a) for d, t, a in parse_section(crop, start_day, days, profile)]
+        page.close()
+        timings.append((rasterized - start, time.perf_counter() - rasterized))
+    return records, timings
+
+
+def score(records: list, truth: list) -> dict:
+    found, expected = Counter(records), Counter(truth)
+    correct = sum((found & expected).values())
+    by_day = {}
+    for r in truth:
+        by_day.setdefault(r[:2], Counter())[r] += 1
+    got_day = {}
+    for r in records:
+        got_day.setdefault(r[:2], Counter())[r] += 1
+    days_ok = sum(got_day.get(day, Counter()) == want for day, want in by_day.items())
+    return {
+        "precision": correct / len(records) if records else 0.0,
+        "recall": correct / len(truth) if truth else 0.0,
+        "days": days_ok / len(by_day) if by_day else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default="GateTimes2025.pdf")
+    parser.add_argument("--truth", default="gate_times.csv", help="known-good CSV of gate times")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=PROFILES)
+    parser.add_argument("--dpi", nargs="+", type=int, help="resolutions to try (default: each profile's)")
+    parser.add_argument("--pages", type=int, default=None, help="only OCR the first N pages")
+    args = parser.parse_args()
+
+    truth = load_records(args.truth)
+    pages = args.pages or len(page_sizes(args.pdf))
+    months = {t[0] for index in range(pages) for t in page_tables(index)}
+    print(f"{'profile':10} {'dpi':>4} {'raster/pg':>10} {'ocr/pg':>8} {'records':>8} "
+          f"{'precision':>9} {'recall':>7} {'days':>7}")
+    for name in args.profiles:
+        profile = PROFILES[name]
+        for dpi in args.dpi or [profile["dpi"]]:
+            records, timings = run_profile(args.pdf, profile, dpi, pages)
+            expected = [r for r in truth if r[0] in months]
+            s = score(records, expected)
+            raster = sum(t[0] for t in timings) / len(timings)
+            ocr = sum(t[1] for t in timings) / len(timings)
+            print(f"{name:10} {dpi:4d} {raster:9.2f}s {ocr:7.2f}s {len(records):8d} "
+                  f"{s['precision']:9.1%} {s['recall']:7.1%} {s['days']:7.1%}")
+
+
+if __name__ == "__main__":
+    main()
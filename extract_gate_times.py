@@ -1,17 +1,69 @@
 import re
 import csv
-from pdf2image import convert_from_path
+import os
+import json
+import hashlib
+import time
+import argparse
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
 from PIL import Image
 
-def ocr_image(img):
-    text = pytesseract.image_to_string(img, lang='eng')
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April',
+    'May', 'June', 'July', 'August',
+    'September', 'October', 'November', 'December'
+]
+
+MONTH_DAYS = {
+    'January': 31,
+    'February': 28,
+    'March': 31,
+    'April': 30,
+    'May': 31,
+    'June': 30,
+    'July': 31,
+    'August': 31,
+    'September': 30,
+    'October': 31,
+    'November': 30,
+    'December': 31,
+}
+
+ITEM = re.compile(r"(\d{2}:\d{2})\s+(Raise|Lower)")
+
+TESSERACT_LANG = 'eng'
+CACHE_DIR = '.ocr_cache'
+
+# OCR settings: Tesseract flags, the grey level at or above which a pixel is
+# paper rather than ink (None to OCR the crop as rendered) and the resolution
+# pages are rasterized at. ``table`` reads each crop as one uniform block
+# (--psm 6) and only allows the characters the tables contain.
+PROFILES = {
+    'default': {'config': '', 'threshold': None, 'dpi': 300},
+    'table': {
+        'config': '--psm 6 -c tessedit_char_whitelist=0123456789:RaiseLower',
+        'threshold': 160,
+        'dpi': 200,
+    },
+}
+
+def ocr_image(img, profile=PROFILES['default']):
+    if profile['threshold'] is not None:
+        threshold = profile['threshold']
+        img = img.convert('L').point(lambda p: 255 if p >= threshold else 0)
+    text = pytesseract.image_to_string(img, lang=TESSERACT_LANG, config=profile['config'])
     return ''.join(c for c in text if c.isprintable() or c=='\n')
 
 
-def parse_section(img, start_day, days):
-    text = ocr_image(img)
-    items = re.findall(r"(\d{2}:\d{2})\s+(Raise|Lower)", text)
+def parse_section(img, start_day, days, profile=PROFILES['default']):
+    return parse_text(ocr_image(img, profile), start_day, days)
+
+def parse_text(text, start_day, days):
+    items = ITEM.findall(text)
     records = []
     for i in range(days):
         for t, a in items[i*4:(i+1)*4]:
@@ -19,52 +71,202 @@ def parse_section(img, start_day, days):
 
     return records
 
-def extract(pdf_path, csv_path):
-    pages = convert_from_path(pdf_path, dpi=300)
-    month_names = [
-        'January', 'February', 'March', 'April',
-        'May', 'June', 'July', 'August',
-        'September', 'October', 'November', 'December'
-    ]
-    month = 0
-
-    month_days = {
-        'January': 31,
-        'February': 28,
-        'March': 31,
-        'April': 30,
-        'May': 31,
-        'June': 30,
-        'July': 31,
-        'August': 31,
-        'September': 30,
-        'October': 31,
-        'November': 30,
-        'December': 31,
-    }
+def page_tables(index):
+    """(month, start_day, days, column) for each half-month table on a page.
+
+    Each page holds two months side by side, and each month is split into
+    days 1-16 in the left column and the rest of the month in the right, so
+    columns run 0-3 across the page.
+    """
+    tables = []
+    for half in range(2):
+        name = MONTH_NAMES[(index*2 + half) % 12]
+        days = MONTH_DAYS[name]
+        tables.append((name, 1, 16, half*2))
+        if days - 16 > 0:
+            tables.append((name, 17, days - 16, half*2 + 1))
+    return tables
+
+def column_box(column, w, h):
+    x0, x1 = (0, w//2) if column < 2 else (w//2, w)
+    mid = x0 + (x1 - x0)//2
+    return (x0,0,mid,h) if column % 2 == 0 else (mid,0,x1,h)
+
+def page_sizes(pdf_path):
+    """Width and height in points of each page of ``pdf_path``."""
+    count = pdfinfo_from_path(pdf_path)['Pages']
+    info = subprocess.run(['pdfinfo', '-f', '1', '-l', str(count), pdf_path],
+                          capture_output=True, text=True, check=True).stdout
+    sizes = re.findall(r'Page\s+\d+\s+size:\s+([\d.]+) x ([\d.]+)', info)
+    return [(float(w), float(h)) for w, h in sizes]
+
+def text_layer(pdf_path, page_no, box):
+    """Embedded text inside ``box`` (in points) on a page, or '' if there is none."""
+    x0, y0, x1, y1 = (round(v) for v in box)
+    args = ['pdftotext', '-layout', '-f', str(page_no), '-l', str(page_no),
+            '-x', str(x0), '-y', str(y0), '-W', str(x1 - x0), '-H', str(y1 - y0),
+            pdf_path, '-']
+    result = subprocess.run(args, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else ''
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_path(cache_dir, pdf_digest, page_no, box, dpi, profile):
+    """Cache file for the OCR text of one crop.
 
+    It is named by a hash of everything the text depends on, so a changed
+    PDF, crop, resolution or Tesseract setting simply misses the cache.
+    """
+    key = json.dumps([pdf_digest, page_no, [round(v, 2) for v in box], dpi,
+                      TESSERACT_LANG, profile['config'], profile['threshold']])
+    return os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest() + '.txt')
+
+def read_cache(path):
+    if path is None:
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def write_cache(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def sections(pdf_path, dpi=300, report=None, use_text_layer=True, cache_dir=CACHE_DIR,
+             profile=PROFILES['default']):
+    """Yield (month, start_day, days, source, cache_path) for each half-month table.
+
+    ``source`` is the table's text when the PDF's text layer holds all four
+    entries for each of its days, or when OCR text for the crop is already
+    in ``cache_dir``. Otherwise the page is rasterized in greyscale, one page
+    at a time, and ``source`` is the table's crop to OCR, with the text to be
+    saved at ``cache_path``; the page is closed as soon as its tables have
+    been cropped out. ``(page, 'text', 'cache' or 'ocr', seconds)`` is
+    appended to ``report`` per page.
+    """
+    pdf_digest = file_digest(pdf_path) if cache_dir else None
+    for index, (w, h) in enumerate(page_sizes(pdf_path)):
+        n = index + 1
+        tables = page_tables(index)
+        start = time.perf_counter()
+        if use_text_layer:
+            texts = [text_layer(pdf_path, n, column_box(col, w, h)) for *_, col in tables]
+            if all(len(ITEM.findall(t)) >= 4*days for t, (_, _, days, _) in zip(texts, tables)):
+                if report is not None:
+                    report.append((n, 'text', time.perf_counter() - start))
+                for (name, start_day, days, _), text in zip(tables, texts):
+                    yield name, start_day, days, text, None
+                continue
+        boxes = [column_box(col, w, h) for *_, col in tables]
+        paths = [cache_path(cache_dir, pdf_digest, n, box, dpi, profile) if cache_dir else None
+                 for box in boxes]
+        cached = [read_cache(p) for p in paths]
+        if all(text is not None for text in cached):
+            if report is not None:
+                report.append((n, 'cache', time.perf_counter() - start))
+            for (name, start_day, days, _), text in zip(tables, cached):
+                yield name, start_day, days, text, None
+            continue
+        page, = convert_from_path(pdf_path, dpi=dpi, first_page=n, last_page=n, grayscale=True)
+        if report is not None:
+            report.append((n, 'ocr', time.perf_counter() - start))
+        for (name, start_day, days, col), path, text in zip(tables, paths, cached):
+            source = text if text is not None else page.crop(column_box(col, *page.size))
+            yield name, start_day, days, source, path
+        page.close()
+
+def ocr_section(section, profile=PROFILES['default']):
+    name, start_day, days, source, path = section
+    start = time.perf_counter()
+    if isinstance(source, str):
+        text = source
+    else:
+        text = ocr_image(source, profile)
+        if path:
+            write_cache(path, text)
+    records = [(name, d, t, a) for d, t, a in parse_text(text, start_day, days)]
+    return records, time.perf_counter() - start
+
+def single_threaded_tesseract():
+    # Tesseract runs several OpenMP threads per call, which only contend with
+    # each other when one call already runs per core.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+def ocr_sections(sections, workers, profile=PROFILES['default']):
+    """Yield ``ocr_section`` results in order, OCRing up to ``workers`` at once.
+
+    At most two sections per worker are queued, so crops are released as
+    they are parsed instead of piling up ahead of the pool.
+    """
+    if workers == 1:
+        for section in sections:
+            yield ocr_section(section, profile)
+        return
+    with ProcessPoolExecutor(workers, initializer=single_threaded_tesseract) as pool:
+        # Collected in submission order, so records stay in month/day order
+        # however the sections finish.
+        pending = deque()
+        for section in sections:
+            pending.append(pool.submit(ocr_section, section, profile))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def extract(pdf_path, csv_path, workers=None, use_text_layer=True, cache_dir=CACHE_DIR,
+            profile='default', dpi=None):
+    workers = workers or os.cpu_count() or 1
+    profile = PROFILES[profile]
+    dpi = dpi or profile['dpi']
+    started = time.perf_counter()
+    report = []
+    ocr_seconds = []
     records = []
-    for page in pages:
-        w,h = page.size
-        for half in [page.crop((0,0,w//2,h)), page.crop((w//2,0,w,h))]:
-            hw,hh = half.size
-
-            left = half.crop((0,0,hw//2,hh))
-            right = half.crop((hw//2,0,hw,hh))
-            name = month_names[month % 12]
-            days = month_days[name]
-            first_days = 16
-            second_days = days - 16
-            records += [(name, d, t, a) for d, t, a in parse_section(left, 1, first_days)]
-            if second_days > 0:
-                records += [(name, d, t, a) for d, t, a in parse_section(right, 17, second_days)]
-            month += 1
+    tables = sections(pdf_path, dpi, report, use_text_layer, cache_dir, profile)
+    for section_records, seconds in ocr_sections(tables, workers, profile):
+        records += section_records
+        ocr_seconds.append(seconds)
+    finished = time.perf_counter()
 
     with open(csv_path,'w',newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['month','day','time','action'])
         writer.writerows(records)
 
+    paths = {'text': 'text layer', 'cache': 'OCR cache', 'ocr': 'rasterized for OCR'}
+    for n, path, seconds in report:
+        print(f'Page {n}: {paths[path]} ({seconds:.2f}s)')
+    print(f'Parsed {len(ocr_seconds)} sections on {workers} worker(s): '
+          f'{sum(ocr_seconds):.1f}s total, slowest section {max(ocr_seconds, default=0):.1f}s')
+    print(f'{len(records)} records in {finished - started:.1f}s')
+    return records
+
 if __name__ == '__main__':
-    extract('GateTimes2025.pdf','gate_times.csv')
-    print('Wrote gate_times.csv')
+    parser = argparse.ArgumentParser(description='Extract gate times from the published PDF.')
+    parser.add_argument('pdf', nargs='?', default='GateTimes2025.pdf')
+    parser.add_argument('csv', nargs='?', default='gate_times.csv')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='OCR processes to run (default: one per CPU; 1 runs in-process)')
+    parser.add_argument('--ocr', action='store_true',
+                        help='ignore the PDF text layer and OCR every page')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f'where OCR text is cached between runs (default {CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='always run OCR')
+    parser.add_argument('--profile', choices=PROFILES, default='default',
+                        help='Tesseract settings to OCR with (see PROFILES)')
+    parser.add_argument('--dpi', type=int, default=None,
+                        help="rasterization resolution (default: the profile's)")
+    args = parser.parse_args()
+    cache_dir = None if args.no_cache else args.cache_dir
+    extract(args.pdf, args.csv, args.workers, not args.ocr, cache_dir, args.profile, args.dpi)
+    print(f'Wrote {args.csv}')
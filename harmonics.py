@@ -0,0 +1,190 @@
+"""Harmonic tide prediction fitted to cached WorldTides heights.
+
+The tide is modelled as a mean level plus a sum of astronomical constituents,
+each a cosine at a fixed speed whose amplitude and phase are fitted by least
+squares. The slow 18.6-year modulation of the lunar constituents is applied
+with the usual nodal factors, so a model fitted to six months of heights can
+predict heights and high/low waters for years ahead.
+"""
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+# Name, speed in degrees per hour, nodal correction. In fitting priority
+# order: a constituent is skipped if the record is too short to separate it
+# from one listed before it.
+CONSTITUENTS = [
+    ("M2", 28.9841042, "M2"),
+    ("S2", 30.0000000, None),
+    ("N2", 28.4397295, "M2"),
+    ("K1", 15.0410686, "K1"),
+    ("O1", 13.9430356, "O1"),
+    ("M4", 57.9682084, "M4"),
+    ("K2", 30.0821373, "K2"),
+    ("MS4", 58.9841042, "M2"),
+    ("MN4", 57.4238337, "M4"),
+    ("P1", 14.9589314, None),
+    ("Q1", 13.3986609, "O1"),
+    ("NU2", 28.5125831, "M2"),
+    ("MU2", 27.9682084, "M2"),
+    ("L2", 29.5284789, "M2"),
+    ("2N2", 27.8953548, "M2"),
+    ("M6", 86.9523127, "M6"),
+    ("MK3", 44.0251729, "MK3"),
+    ("M3", 43.4761563, "M3"),
+    ("T2", 29.9589333, None),
+    ("SSA", 0.0821373, None),
+    ("SA", 0.0410686, None),
+]
+
+EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp()
+J2000 = datetime(2000, 1, 1, 12, tzinfo=timezone.utc).timestamp()
+
+# Mean longitude of the Sun at EPOCH, in degrees.
+SUN_LONGITUDE = 280.4664567 + 0.98564736629 * (EPOCH - J2000) / 86400
+
+# Constituents too close to a major one to fit from half a year of data are
+# inferred from it using the equilibrium amplitude ratio and the same phase
+# lag. The last value is the difference in astronomical argument at EPOCH.
+INFERRED = {
+    "K2": ("S2", 0.272, 2 * SUN_LONGITUDE),
+    "P1": ("K1", 0.331, 180 - 2 * SUN_LONGITUDE),
+}
+
+
+def nodal_corrections(ts: np.ndarray, kinds: list) -> tuple:
+    """Nodal amplitude factors ``f`` and phase corrections ``u`` (radians).
+
+    Uses the simplified formulas in Pugh, *Tides, Surges and Mean Sea-Level*,
+    based on the longitude of the Moon's ascending node. Returns arrays of
+    shape ``(len(ts), len(kinds))``.
+    """
+    days = (np.asarray(ts, dtype=np.float64) - J2000) / 86400
+    node = np.radians(125.0445479 - 0.0529538083 * days)[:, None]
+    c1, c2, c3 = np.cos(node), np.cos(2 * node), np.cos(3 * node)
+    s1, s2, s3 = np.sin(node), np.sin(2 * node), np.sin(3 * node)
+    f_m2 = 1.0004 - 0.0373 * c1 + 0.0002 * c2
+    u_m2 = -2.14 * s1
+    f_k1 = 1.0060 + 0.1150 * c1 - 0.0088 * c2 + 0.0006 * c3
+    u_k1 = -8.86 * s1 + 0.68 * s2 - 0.07 * s3
+    f_o1 = 1.0089 + 0.1871 * c1 - 0.0147 * c2 + 0.0014 * c3
+    u_o1 = 10.80 * s1 - 1.34 * s2 + 0.19 * s3
+    f_k2 = 1.0241 + 0.2863 * c1 + 0.0083 * c2 - 0.0015 * c3
+    u_k2 = -17.74 * s1 + 0.68 * s2 - 0.04 * s3
+    table = {
+        None: (np.ones_like(f_m2), np.zeros_like(u_m2)),
+        "M2": (f_m2, u_m2),
+        "K1": (f_k1, u_k1),
+        "O1": (f_o1, u_o1),
+        "K2": (f_k2, u_k2),
+        "M3": (f_m2**1.5, 1.5 * u_m2),
+        "M4": (f_m2**2, 2 * u_m2),
+        "M6": (f_m2**3, 3 * u_m2),
+        "MK3": (f_m2 * f_k1, u_m2 + u_k1),
+    }
+    f = np.hstack([table[k][0] for k in kinds])
+    u = np.hstack([table[k][1] for k in kinds])
+    return f, np.radians(u)
+
+
+class HarmonicModel:
+    """Fitted mean level and constituent amplitudes for one location."""
+
+    def __init__(self, names: list, mean: float, cos: list, sin: list):
+        self.names = list(names)
+        self.mean = mean
+        self.cos = np.asarray(cos, dtype=np.float64)
+        self.sin = np.asarray(sin, dtype=np.float64)
+        table = {name: (speed, kind) for name, speed, kind in CONSTITUENTS}
+        self.speeds = np.radians([table[n][0] for n in self.names]) / 3600
+        self.kinds = [table[n][1] for n in self.names]
+
+    @classmethod
+    def fit(cls, ts, heights) -> Optional["HarmonicModel"]:
+        """Least-squares fit to heights at epoch seconds ``ts``.
+
+        Returns None if the record is too short to resolve any constituent.
+        """
+        ts = np.asarray(ts, dtype=np.float64)
+        heights = np.asarray(heights, dtype=np.float64)
+        if len(ts) < 2:
+            return None
+        span = (ts[-1] - ts[0]) / 3600
+        # Rayleigh criterion: two constituents need a record of at least one
+        # beat period between them to be told apart.
+        resolution = 360 / span if span else math.inf
+        names = []
+        for name, speed, _ in CONSTITUENTS:
+            chosen = [s for n, s, _ in CONSTITUENTS if n in names]
+            if speed >= resolution and all(abs(speed - s) >= resolution for s in chosen):
+                names.append(name)
+        if not names:
+            return None
+
+        model = cls(names, 0.0, np.zeros(len(names)), np.zeros(len(names)))
+        phase = model._phase(ts)
+        f, _ = nodal_corrections(ts, model.kinds)
+        design = np.hstack([np.ones((len(ts), 1)), f * np.cos(phase), f * np.sin(phase)])
+        coef, *_ = np.linalg.lstsq(design, heights, rcond=None)
+        n = len(names)
+        cos, sin = list(coef[1 : n + 1]), list(coef[n + 1 :])
+        for name, (source, ratio, shift) in INFERRED.items():
+            if name not in names and source in names:
+                i = names.index(source)
+                amplitude = ratio * math.hypot(cos[i], sin[i])
+                phase = math.atan2(sin[i], cos[i]) - math.radians(shift)
+                names.append(name)
+                cos.append(amplitude * math.cos(phase))
+                sin.append(amplitude * math.sin(phase))
+        return cls(names, float(coef[0]), cos, sin)
+
+    def _phase(self, ts: np.ndarray) -> np.ndarray:
+        _, u = nodal_corrections(ts, self.kinds)
+        return (ts[:, None] - EPOCH) * self.speeds + u
+
+    def predict(self, ts) -> np.ndarray:
+        """Heights at epoch seconds ``ts``."""
+        ts = np.asarray(ts, dtype=np.float64)
+        phase = self._phase(ts)
+        f, _ = nodal_corrections(ts, self.kinds)
+        return self.mean + (f * (self.cos * np.cos(phase) + self.sin * np.sin(phase))).sum(axis=1)
+
+    def _rate(self, ts: np.ndarray) -> np.ndarray:
+        """Rate of change of height per second (nodal drift neglected)."""
+        phase = self._phase(ts)
+        f, _ = nodal_corrections(ts, self.kinds)
+        terms = f * self.speeds * (self.sin * np.cos(phase) - self.cos * np.sin(phase))
+        return terms.sum(axis=1)
+
+    def extremes(self, start: float, end: float, step: int = 360) -> list:
+        """High and low waters between epoch seconds ``start`` and ``end``.
+
+        Returns WorldTides-style ``{"dt", "height", "type"}`` dicts with
+        integer epoch ``dt``.
+        """
+        grid = np.arange(start, end + step, step, dtype=np.float64)
+        rate = self._rate(grid)
+        turn = np.flatnonzero((rate[:-1] > 0) != (rate[1:] > 0))
+        r0, r1 = rate[turn], rate[turn + 1]
+        times = grid[turn] + step * r0 / (r0 - r1)
+        keep = (times >= start) & (times < end)
+        times, high = times[keep], (r0 > 0)[keep]
+        heights = self.predict(times)
+        return [
+            {"dt": int(round(t)), "height": round(h, 3), "type": "High" if hi else "Low"}
+            for t, h, hi in zip(times.tolist(), heights.tolist(), high.tolist())
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "names": self.names,
+            "mean": self.mean,
+            "cos": self.cos.tolist(),
+            "sin": self.sin.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HarmonicModel":
+        return cls(data["names"], data["mean"], data["cos"], data["sin"])
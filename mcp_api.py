@@ -2,14 +2,32 @@ from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import os
 import asyncio
+import json
 import secrets
-import requests
+import sqlite3
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from importlib.util import find_spec
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Depends, Security
+from urllib.parse import urlsplit
+import brotli
+import httpx
+import msgpack
+import numpy as np
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, Security
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, APIKeyHeader
 from pydantic import BaseModel
+from starlette.datastructures import MutableHeaders
 from dotenv import load_dotenv
 
+from harmonics import HarmonicModel
+
+
 load_dotenv()
 
 WORLDTIDES_KEY = os.getenv("WORLDTIDES_KEY")
@@ -18,21 +36,487 @@ BASIC_AUTH_USER = os.getenv("BASIC_AUTH_USER")
 BASIC_AUTH_PASS = os.getenv("BASIC_AUTH_PASS")
 MCP_API_KEY = os.getenv("MCP_API_KEY")
 GATE_OPEN_HEIGHT = float(os.getenv("GATE_OPEN_HEIGHT", "4"))
+# See CrossingIndex.crossings
+INTERPOLATION_METHODS = ("linear", "cubic", "cosine")
+GATE_INTERPOLATION = os.getenv("GATE_INTERPOLATION", "linear")
+if GATE_INTERPOLATION not in INTERPOLATION_METHODS:
+    raise ValueError(
+        f"GATE_INTERPOLATION must be one of {', '.join(INTERPOLATION_METHODS)}, "
+        f"not {GATE_INTERPOLATION!r}"
+    )
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "8"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+TIDE_REFRESH_MODE = os.getenv("TIDE_REFRESH_MODE", "incremental")
+# "worldtides" or "harmonic" (predict locally from a model fitted to WorldTides heights)
+TIDE_SOURCE = os.getenv("TIDE_SOURCE", "worldtides")
+CACHE_DB = os.getenv("CACHE_DB", "gatetimes_cache.db")
+REFRESH_INTERVAL = timedelta(hours=12)
+WEATHER_MAX_AGE = timedelta(hours=3)
+TIDE_HEIGHTS_MAX_AGE = timedelta(days=7)
+# A stale cache is not fetched again this soon after a failed attempt.
+REFRESH_RETRY_DELAY = timedelta(minutes=5)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+WARMUP_RETRY_AFTER = 30
+# How far past a day /tide-windows looks for the end of its last window.
+WINDOW_MARGIN = 2 * 86400
+# Harmonic predictions are only offered this far either side of today.
+PREDICTION_RANGE = timedelta(days=50 * 365)
+# Client-supplied coordinates are rounded to this many decimals (~1 km at 2).
+COORD_PRECISION = int(os.getenv("COORD_PRECISION", "2"))
+SUN_CACHE_SIZE = int(os.getenv("SUN_CACHE_SIZE", "1000"))
+SUN_CACHE_TTL = int(os.getenv("SUN_CACHE_TTL", str(7 * 24 * 3600)))
+MOON_CACHE_SIZE = int(os.getenv("MOON_CACHE_SIZE", "1000"))
+MOON_CACHE_TTL = int(os.getenv("MOON_CACHE_TTL", str(30 * 24 * 3600)))
+MARINE_CACHE_SIZE = int(os.getenv("MARINE_CACHE_SIZE", "100"))
+MARINE_CACHE_TTL = int(os.getenv("MARINE_CACHE_TTL", str(3 * 3600)))
+# Responses smaller than this many bytes are sent uncompressed.
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Distinguishes ETags issued by this process from those of earlier runs.
+BOOT_ID = secrets.token_hex(4)
+# Representations of /tide-heights, by the media type that selects them.
+SERIES_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "text/csv": "csv",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+SERIES_MEDIA_TYPES = {
+    "json": "application/json",
+    "columns": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "msgpack": "application/msgpack",
+}
 LAT = 53.28
 LON = -3.83
 TZ = ZoneInfo("Europe/London")
 
+
+class Rendered:
+    """A JSON body serialised once and served as-is.
+
+    After ``compress`` the body is also kept gzip and brotli encoded, and
+    ``response`` sends whichever encoding the request accepts. Bodies that
+    are not precompressed are left to ``GZipMiddleware``.
+    """
+
+    def __init__(self, content):
+        self.body = orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        self.encoded: dict[str, bytes] = {}
+
+    def compress(self) -> "Rendered":
+        """Encode the body at maximum compression, if it is worth compressing."""
+        if len(self.body) >= COMPRESS_MIN_SIZE and not self.encoded:
+            self.encoded["br"] = brotli.compress(self.body, mode=brotli.MODE_TEXT)
+            gzip = zlib.compressobj(9, zlib.DEFLATED, 31)
+            self.encoded["gzip"] = gzip.compress(self.body) + gzip.flush()
+        return self
+
+    def response(self, headers: Optional[dict] = None, request: Optional[Request] = None) -> Response:
+        if self.encoded and request is not None:
+            accepted = accept_tokens(request.headers.get("accept-encoding", ""))
+            for encoding, body in self.encoded.items():
+                if encoding in accepted:
+                    # GZipMiddleware passes this through untouched, so add its Vary.
+                    headers = dict(headers or {}, **{"Content-Encoding": encoding})
+                    headers["Vary"] = ", ".join(filter(None, (headers.get("Vary"), "Accept-Encoding")))
+                    return Response(body, media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class TideStore:
+    """Tide extremes indexed by local date.
+
+    Events are kept in time order and grouped per ``YYYY-MM-DD`` once when the
+    store is built, so a date's events are a dict hit. Time ranges bisect a
+    parallel list of epoch seconds.
+    """
+
+    def __init__(self, events: Optional[list] = None, covered_until: Optional[str] = None):
+        self.events = events or []
+        # First UTC date not yet fetched from WorldTides
+        self.covered_until = covered_until
+        self.by_date: dict[str, list] = {}
+        for e in self.events:
+            self.by_date.setdefault(e["date"], []).append(e)
+        self.dates = sorted(self.by_date)
+        self.times = [datetime.fromisoformat(e["dt"]).timestamp() for e in self.events]
+        self.rendered: dict[str, Rendered] = {}
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def rendered_date(self, date: str) -> Optional[Rendered]:
+        """The serialised events for ``date``, rendered on first request."""
+        if date not in self.rendered and date in self.by_date:
+            self.rendered[date] = Rendered(tide_events(self.by_date[date])).compress()
+        return self.rendered.get(date)
+
+    def since(self, date: str) -> list:
+        """Return events on or after ``date`` (``YYYY-MM-DD``)."""
+        lo = bisect_left(self.dates, date)
+        return [e for d in self.dates[lo:] for e in self.by_date[d]]
+
+    def between(self, start: float, end: float) -> list:
+        """Return events from epoch ``start`` up to but excluding ``end``."""
+        return self.events[bisect_left(self.times, start) : bisect_left(self.times, end)]
+
+
+class TideSeries:
+    """Tide heights held as parallel epoch-second and height columns.
+
+    JSON records are only built for the rows a response needs.
+    """
+
+    def __init__(self, ts=(), heights=()):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.heights = np.asarray(heights, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def rows(self, start: float, end: float) -> tuple[int, int]:
+        """Row slice for epoch seconds from ``start`` up to but excluding ``end``."""
+        lo, hi = np.searchsorted(self.ts, [start, end]).tolist()
+        return lo, hi
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> list:
+        """Render rows ``start:stop`` as ``{"dt", "date", "height"}`` dicts."""
+        out = []
+        for t, h in zip(self.ts[start:stop].tolist(), self.heights[start:stop].tolist()):
+            dt = iso_local(t)
+            out.append({"dt": dt, "date": dt[:10], "height": round(h, 3)})
+        return out
+
+    def columns(self, start: int, stop: int) -> dict:
+        """Rows ``start:stop`` as parallel arrays, ``dt`` in epoch seconds."""
+        return {"dt": self.ts[start:stop], "height": np.round(self.heights[start:stop], 3)}
+
+    def ndjson(self, start: int, stop: int, chunk: int = 1000):
+        """Yield rows ``start:stop`` as newline-delimited JSON, ``chunk`` rows at a time."""
+        for lo in range(start, stop, chunk):
+            rows = self.records(lo, min(lo + chunk, stop))
+            yield b"".join(orjson.dumps(r) + b"\n" for r in rows)
+
+    def csv(self, start: int, stop: int, chunk: int = 1000):
+        """Yield rows ``start:stop`` as CSV with local ISO times, after a header."""
+        yield b"dt,height\n"
+        for lo in range(start, stop, chunk):
+            hi = min(lo + chunk, stop)
+            rows = zip(self.ts[lo:hi].tolist(), self.heights[lo:hi].tolist())
+            yield "".join(f"{iso_local(t)},{round(h, 3)}\n" for t, h in rows).encode()
+
+
+class CrossingIndex:
+    """Monotonic segments of a tide series for any-threshold crossing queries.
+
+    The series is split once at its turning points into runs that only rise or
+    only fall. A threshold is then crossed at most once per run, so a query
+    picks the runs whose end heights straddle it and bisects inside each of
+    them (all runs at once) instead of rescanning every sample.
+    """
+
+    def __init__(self, ts: np.ndarray, heights: np.ndarray):
+        self.ts = ts
+        self.heights = heights.astype(np.float64)
+        direction = np.sign(np.diff(self.heights))
+        moving = np.flatnonzero(direction)
+        if len(self.heights) < 3 or not len(moving):
+            self.starts = self.stops = np.empty(0, np.int64)
+            self.rising = self.turn_valid = np.empty(0, bool)
+            self.turn_ts = self.turn_heights = np.empty(0)
+            self.start_ts = self.stop_ts = np.empty(0, np.int64)
+            return
+        # Flat steps continue in the direction of the step before them.
+        last = np.where(direction != 0, np.arange(len(direction)), -1)
+        last = np.maximum.accumulate(last)
+        last[last < 0] = moving[0]
+        direction = direction[last]
+        turns = np.flatnonzero(direction[1:] != direction[:-1]) + 1
+        self.starts = np.concatenate(([0], turns))
+        self.stops = np.concatenate((turns, [len(self.heights) - 1]))
+        self.rising = direction[self.starts] > 0
+        # Both are sorted, so the runs overlapping a time range are a bisect away.
+        self.start_ts, self.stop_ts = self.ts[self.starts], self.ts[self.stops]
+        self._fit_turning_points()
+
+    def _fit_turning_points(self):
+        """Estimate the time and height of each high and low water.
+
+        A parabola through each turning sample and its neighbours places the
+        extreme between samples. The first and last points of the series are
+        not real extremes and are marked invalid.
+        """
+        i = np.concatenate((self.starts, self.stops[-1:]))
+        valid = (i > 0) & (i < len(self.heights) - 1)
+        j = np.clip(i, 1, len(self.heights) - 2)
+        before, here, after = self.heights[j - 1], self.heights[j], self.heights[j + 1]
+        curve = before - 2 * here + after
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shift = np.where(curve != 0, 0.5 * (before - after) / curve, 0.0)
+        shift = np.clip(shift, -1, 1)
+        step = np.where(shift >= 0, self.ts[j + 1] - self.ts[j], self.ts[j] - self.ts[j - 1])
+        self.turn_ts = np.where(valid, self.ts[i] + shift * step, self.ts[i])
+        self.turn_heights = np.where(valid, here - 0.25 * (before - after) * shift, self.heights[i])
+        self.turn_valid = valid
+
+    def crossings(
+        self,
+        threshold: float,
+        method: str = GATE_INTERPOLATION,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ):
+        """Find where the tide crosses ``threshold`` between consecutive samples.
+
+        Returns the crossing times in epoch seconds and a boolean array that is
+        True where the tide is rising through the threshold. Given ``start``
+        and/or ``end`` (epoch seconds, end excluded) only the runs overlapping
+        that range are examined. ``method`` picks
+        how the time is placed between the two samples either side:
+
+        ``linear``
+            a straight line between the samples.
+        ``cubic``
+            a cubic Hermite curve using the slopes at both samples taken from
+            their neighbours.
+        ``cosine``
+            a half cosine between the neighbouring high and low water, the
+            shape behind the rule of twelfths. Falls back to linear at the
+            ends of the series.
+        """
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"Unknown interpolation method {method!r}")
+        h = self.heights
+        r0 = 0 if start is None else int(np.searchsorted(self.stop_ts, start))
+        r1 = len(self.starts) if end is None else int(np.searchsorted(self.start_ts, end))
+        starts, stops, run_rising = self.starts[r0:r1], self.stops[r0:r1], self.rising[r0:r1]
+        first, last = h[starts], h[stops]
+        up = run_rising & (first < threshold) & (threshold <= last)
+        down = ~run_rising & (first > threshold) & (threshold >= last)
+        runs = np.flatnonzero(up | down) + r0
+        rising = self.rising[runs]
+        # Bisect every run together: the threshold is not reached at lo and
+        # is reached at hi, until they are neighbouring samples.
+        lo, hi = self.starts[runs], self.stops[runs]
+        while True:
+            open_ = hi - lo > 1
+            if not open_.any():
+                break
+            mid = (lo + hi) // 2
+            reached = np.where(rising, h[mid] >= threshold, h[mid] <= threshold)
+            hi = np.where(open_ & reached, mid, hi)
+            lo = np.where(open_ & ~reached, mid, lo)
+        t0 = self.ts[lo].astype(np.float64)
+        t1 = self.ts[hi].astype(np.float64)
+        if method == "cubic":
+            ratio = self._cubic_ratio(lo, hi, threshold)
+        else:
+            ratio = (threshold - h[lo]) / (h[hi] - h[lo])
+        times = t0 + (t1 - t0) * ratio
+        if method == "cosine":
+            times = self._cosine_times(runs, threshold, times)
+        if start is not None or end is not None:
+            keep = (times >= (-np.inf if start is None else start)) & (
+                times < (np.inf if end is None else end)
+            )
+            times, rising = times[keep], rising[keep]
+        return times, rising
+
+    def _slope(self, i: np.ndarray) -> np.ndarray:
+        """Height change per second at sample ``i`` from its neighbours."""
+        before = np.maximum(i - 1, 0)
+        after = np.minimum(i + 1, len(self.heights) - 1)
+        return (self.heights[after] - self.heights[before]) / (self.ts[after] - self.ts[before])
+
+    def _cubic_ratio(self, lo: np.ndarray, hi: np.ndarray, threshold: float) -> np.ndarray:
+        h0, h1 = self.heights[lo], self.heights[hi]
+        dt = (self.ts[hi] - self.ts[lo]).astype(np.float64)
+        m0, m1 = self._slope(lo) * dt, self._slope(hi) * dt
+
+        def curve(u):
+            u2, u3 = u * u, u * u * u
+            return (
+                (2 * u3 - 3 * u2 + 1) * h0
+                + (u3 - 2 * u2 + u) * m0
+                + (-2 * u3 + 3 * u2) * h1
+                + (u3 - u2) * m1
+            )
+
+        # The curve runs from h0 to h1, so bisect for the threshold; 24 rounds
+        # narrow a half-hour step to well under a second.
+        below = np.zeros_like(h0)
+        above = np.ones_like(h0)
+        side = np.sign(h0 - threshold)
+        for _ in range(24):
+            mid = (below + above) / 2
+            same = np.sign(curve(mid) - threshold) == side
+            below = np.where(same, mid, below)
+            above = np.where(same, above, mid)
+        return (below + above) / 2
+
+    def _cosine_times(self, runs: np.ndarray, threshold: float, linear: np.ndarray) -> np.ndarray:
+        ta, tb = self.turn_ts[runs], self.turn_ts[runs + 1]
+        ha, hb = self.turn_heights[runs], self.turn_heights[runs + 1]
+        usable = (
+            self.turn_valid[runs]
+            & self.turn_valid[runs + 1]
+            & (np.minimum(ha, hb) <= threshold)
+            & (threshold <= np.maximum(ha, hb))
+            & (ha != hb)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phase = np.arccos(np.clip((2 * threshold - ha - hb) / (ha - hb), -1, 1))
+        return np.where(usable, ta + (tb - ta) * phase / np.pi, linear)
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire ``ttl`` seconds after storing.
+
+    Entries are stamped with wall-clock time so they can be persisted in the
+    snapshot and still expire correctly after a restart.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: OrderedDict = OrderedDict()  # key -> (stored_at, value)
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def entry(self, key) -> Optional[tuple]:
+        """Return ``(stored_at, value)`` for a live entry, else None."""
+        entry = self.data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self.data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get(self, key):
+        entry = self.entry(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key, value, stored_at: Optional[float] = None) -> tuple:
+        entry = self.data[key] = (stored_at or time.time(), value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def dump(self) -> list:
+        # list() copies in one step; snapshots are written from a worker thread.
+        items = list(self.data.items())
+        return [[key, stored_at, value] for key, (stored_at, value) in items]
+
+    def restore(self, items: list):
+        """Reload ``dump`` output, skipping expired and malformed entries."""
+        now = time.time()
+        for item in items:
+            # Older snapshots saved [key, value] pairs without a store time.
+            if not isinstance(item, list) or len(item) != 3:
+                continue
+            key, stored_at, value = item
+            if now - stored_at <= self.ttl:
+                self.set(key, value, stored_at)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class QualityGZipMiddleware(GZipMiddleware):
+    """``GZipMiddleware`` that honours q-values in Accept-Encoding.
+
+    Starlette only looks for "gzip" in the header, so ``gzip;q=0`` still got
+    gzip. The header is rewritten to the codings ``accept_tokens`` accepts,
+    the same list ``Rendered.response`` picks from.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = MutableHeaders(scope=scope)
+            if "accept-encoding" in headers:
+                headers["accept-encoding"] = ", ".join(accept_tokens(headers["accept-encoding"]))
+        await super().__call__(scope, receive, send)
+
+
+class EncodingETagMiddleware:
+    """Give each content coding of a response its own strong ETag.
+
+    ``"tag"`` becomes ``"tag-gzip"`` or ``"tag-br"`` on an encoded response.
+    Added after ``QualityGZipMiddleware`` so it wraps it and sees the bodies that
+    compresses as well as the precompressed ones.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                encoding, etag = headers.get("content-encoding"), headers.get("etag")
+                if encoding and etag and etag.endswith('"') and not etag.endswith(f'-{encoding}"'):
+                    headers["etag"] = f'{etag[:-1]}-{encoding}"'
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+
 app = FastAPI()
+app.add_middleware(QualityGZipMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=6)
+app.add_middleware(EncodingETagMiddleware)
 
 # In-memory caches
-app.state.tide_cache = []
+app.state.tide_cache = TideStore()
 app.state.weather_cache = {}
+app.state.weather_last_load = datetime.min
 app.state.gate_times = {}
-app.state.tide_heights_cache = []
+app.state.gate_times_rendered = {}
+# The TideSeries the gate times were last computed from
+app.state.gate_times_heights = None
+app.state.crossing_index = CrossingIndex(np.empty(0, np.int64), np.empty(0))
+app.state.harmonic_model = None
+app.state.tide_heights_cache = TideSeries()
 app.state.tide_heights_last_load = datetime.min
-app.state.sun_cache = {}
-app.state.moon_cache = {}
-app.state.marine_cache = {}
+app.state.sun_cache = TTLCache(SUN_CACHE_SIZE, SUN_CACHE_TTL)
+app.state.moon_cache = TTLCache(MOON_CACHE_SIZE, MOON_CACHE_TTL)
+app.state.marine_cache = TTLCache(MARINE_CACHE_SIZE, MARINE_CACHE_TTL)
+app.state.http_client = None
+app.state.host_limits = {}
+app.state.in_flight = {}
+app.state.last_attempt = {}
+app.state.background_tasks = set()
+app.state.cache_status = {
+    name: {"ready": False, "loading": False, "updated": None, "error": None}
+    for name in ("tides", "tide_heights", "weather", "gate_times")
+}
+# Bumped whenever a cache is loaded; part of the ETag of everything served from it.
+app.state.generations = {name: 0 for name in app.state.cache_status}
+app.state.next_refresh = datetime.utcnow()
 
 security_basic = HTTPBasic(auto_error=False)
 api_key_header = APIKeyHeader(name="X-API-KEY", auto_error=False)
@@ -139,7 +623,29 @@ class TideHeight(BaseModel):
     height: float
 
 
-def fetch_tide_chunk(start_date: datetime, days: int):
+def http_client() -> httpx.AsyncClient:
+    """Return the shared keep-alive client, creating it on first use."""
+    if app.state.http_client is None:
+        app.state.http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            # HTTP/2 needs the optional h2 package (pip install httpx[http2]).
+            http2=find_spec("h2") is not None,
+        )
+    return app.state.http_client
+
+
+async def get_json(url: str, params: dict):
+    """GET ``url`` through the pooled client, at most N requests per host."""
+    host = urlsplit(url).hostname
+    if host not in app.state.host_limits:
+        app.state.host_limits[host] = asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST)
+    async with app.state.host_limits[host]:
+        r = await http_client().get(url, params=params)
+    r.raise_for_status()
+    return r.json()
+
+
+async def fetch_tide_chunk(start_date: datetime, days: int):
     url = "https://www.worldtides.info/api/v3"
     params = {
         "extremes": "",
@@ -149,12 +655,34 @@ def fetch_tide_chunk(start_date: datetime, days: int):
         "days": days,
         "key": WORLDTIDES_KEY,
     }
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json().get("extremes", [])
+    data = await get_json(url, params)
+    return data.get("extremes", [])
 
 
-def to_local(dt: int) -> datetime:
+def retryable(exc: httpx.HTTPError) -> bool:
+    """Whether a failed request may succeed if tried again.
+
+    Rate limiting and server errors are; other 4xx responses, such as a bad
+    key or no credits left, would fail the same way again.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+async def fetch_with_retry(fetch, *args, retries: int = FETCH_RETRIES, backoff: float = 1.0):
+    """Await ``fetch(*args)`` retrying failed requests with exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return await fetch(*args)
+        except httpx.HTTPError as exc:
+            if attempt == retries or not retryable(exc):
+                raise
+            await asyncio.sleep(backoff * 2**attempt)
+
+
+def to_local(dt: float) -> datetime:
     return datetime.fromtimestamp(dt, tz=timezone.utc).astimezone(TZ)
 
 
@@ -163,25 +691,21 @@ def iso_local(dt: int) -> str:
     return to_local(dt).isoformat()
 
 
-def fetch_sunrise_sunset(date: str, lat: float, lng: float):
+async def fetch_sunrise_sunset(date: str, lat: float, lng: float):
     url = "https://api.sunrise-sunset.org/json"
     params = {"lat": lat, "lng": lng, "date": date, "formatted": 0}
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    data = r.json()
+    data = await get_json(url, params)
     data["tzid"] = TZ.key
     return data
 
 
-def fetch_moon_phase(ts: int):
+async def fetch_moon_phase(ts: int):
     url = "https://api.farmsense.net/v1/moonphases/"
     params = {"d": ts}
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    return await get_json(url, params)
 
 
-def fetch_marine_forecast(
+async def fetch_marine_forecast(
     lat: float,
     lon: float,
     hourly: str,
@@ -196,52 +720,128 @@ def fetch_marine_forecast(
         "timeformat": timeformat,
         "forecast_hours": forecast_hours,
     }
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    return await get_json(url, params)
+
+
+def tide_events(extremes: list) -> list:
+    """Extremes reduced to the ``TideEvent`` fields, ready to serialise."""
+    return [
+        {"dt": e["dt"], "date": e["date"], "height": e["height"], "type": e["type"]}
+        for e in extremes
+    ]
+
+
+def localise_extremes(extremes: list) -> list:
+    """Replace epoch ``dt`` values with local ISO times and add the local date."""
+    for e in extremes:
+        dt_local = to_local(e["dt"])
+        e["dt"] = dt_local.isoformat()
+        e["date"] = dt_local.strftime("%Y-%m-%d")
+    return extremes
+
+
+async def harmonic_model() -> Optional[HarmonicModel]:
+    """The fitted tide model, fetching heights to fit one if there is none."""
+    if app.state.harmonic_model is None and WORLDTIDES_KEY:
+        await refresh_cache("tide_heights", load_tide_heights)
+    return app.state.harmonic_model
 
 
-def load_tide_data():
+async def load_tide_data(incremental: bool = TIDE_REFRESH_MODE == "incremental") -> bool:
+    """Fetch a year of tide extremes; False if there is no key to fetch with.
+
+    In incremental mode the cached extremes are kept, days already in the past
+    are dropped and only the part of the 365-day horizon beyond what has been
+    fetched before is requested from WorldTides. With ``TIDE_SOURCE=harmonic``
+    the year is predicted locally instead.
+    """
+    if TIDE_SOURCE == "harmonic" and (model := await harmonic_model()):
+        start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=365)
+        extremes = await asyncio.to_thread(
+            model.extremes, start.timestamp(), end.timestamp()
+        )
+        app.state.tide_cache = TideStore(
+            localise_extremes(extremes), end.strftime("%Y-%m-%d")
+        )
+        return True
+
     if not WORLDTIDES_KEY:
         print("WORLDTIDES_KEY not set; skipping tide fetch")
-        return
-
-    app.state.tide_cache = []
+        return False
 
+    store = app.state.tide_cache
     start = datetime.utcnow()
     end = start + timedelta(days=365)
+    today = datetime.now(TZ).strftime("%Y-%m-%d")
+    kept = []
+    if incremental and store.covered_until:
+        covered = datetime.strptime(store.covered_until, "%Y-%m-%d")
+        if covered.date() > start.date():
+            kept = store.since(today)
+            start = covered
+
+    chunks = []
     current = start
-    while current < end:
+    while (end - current).days > 0:
         chunk_days = min(7, (end - current).days)
-        chunk = fetch_tide_chunk(current, chunk_days)
-        for e in chunk:
-            dt_local = to_local(e["dt"])
-            e["dt"] = dt_local.isoformat()
-            e["date"] = dt_local.strftime("%Y-%m-%d")
-
-        app.state.tide_cache.extend(chunk)
+        chunks.append((current, chunk_days))
         current += timedelta(days=chunk_days)
 
+    # Fetch the weekly chunks concurrently; gather() returns them in order.
+    # One chunk failing fails the refresh, so stop the rest rather than
+    # spend requests on results that would be thrown away.
+    tasks = [asyncio.create_task(fetch_with_retry(fetch_tide_chunk, *c)) for c in chunks]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    seen = {e["dt"] for e in kept}
+    events = list(kept)
+    for chunk in results:
+        events.extend(e for e in localise_extremes(chunk) if e["dt"] not in seen)
+
+    app.state.tide_cache = TideStore(events, current.strftime("%Y-%m-%d"))
+    return True
+
+
+async def load_tide_heights() -> bool:
+    """Load half-hour tide heights for the next six months.
+
+    Heights fetched from WorldTides are also used to refit the harmonic
+    model; with ``TIDE_SOURCE=harmonic`` an existing model predicts them.
+    Returns False if there is neither a model nor a key to fetch with.
+    """
+    now = datetime.utcnow()
+    model = app.state.harmonic_model
+    if TIDE_SOURCE == "harmonic" and model is not None:
+        start = int(now.replace(tzinfo=timezone.utc).timestamp()) // 86400 * 86400
+        ts = np.arange(start, start + 180 * 86400, 1800, dtype=np.int64)
+        heights = await asyncio.to_thread(model.predict, ts)
+        app.state.tide_heights_cache = TideSeries(ts, heights)
+        app.state.tide_heights_last_load = now
+        return True
 
-def load_tide_heights():
-    """Load half-hour tide heights for the next six months."""
     if not WORLDTIDES_KEY:
         print("WORLDTIDES_KEY not set; skipping tide heights fetch")
-        return
+        return False
 
-    start = datetime.utcnow()
     # Roughly six months of data (about 180 days)
-    heights = fetch_tide_heights(start, 180)
-    for h in heights:
-        dt_local = to_local(h["dt"])
-        h["dt"] = dt_local.isoformat()
-        h["date"] = dt_local.strftime("%Y-%m-%d")
-
-    app.state.tide_heights_cache = heights
+    heights = await fetch_tide_heights(now, 180)
+    series = TideSeries([h["dt"] for h in heights], [h["height"] for h in heights])
+    app.state.tide_heights_cache = series
     app.state.tide_heights_last_load = datetime.utcnow()
+    if len(series) > 1:
+        model = await asyncio.to_thread(HarmonicModel.fit, series.ts, series.heights)
+        # Too short a record to fit keeps the previous model.
+        if model is not None:
+            app.state.harmonic_model = model
+    return True
 
 
-def fetch_tide_heights(start_date: datetime, days: int):
+async def fetch_tide_heights(start_date: datetime, days: int):
     url = "https://www.worldtides.info/api/v3"
     params = {
         "heights": "",
@@ -252,15 +852,14 @@ def fetch_tide_heights(start_date: datetime, days: int):
         "datum": "CD",
         "key": WORLDTIDES_KEY,
     }
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json().get("heights", [])
+    data = await get_json(url, params)
+    return data.get("heights", [])
 
 
-def load_weather_data():
+async def load_weather_data() -> bool:
     if not OPENWEATHER_KEY:
         print("OPENWEATHER_KEY not set; skipping weather fetch")
-        return
+        return False
     url = "https://api.openweathermap.org/data/3.0/onecall"
     params = {
         "lat": LAT,
@@ -269,11 +868,11 @@ def load_weather_data():
         "units": "metric",
         "appid": OPENWEATHER_KEY,
     }
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    data = r.json()
+    data = await get_json(url, params)
 
-    app.state.weather_cache = {}
+    # Built aside and swapped in whole, as save_snapshot may be serialising
+    # the current dict in a worker thread.
+    days = {}
     for day in data.get("daily", []):
         dt_local = to_local(day["dt"])
         date_str = dt_local.strftime("%Y-%m-%d")
@@ -285,106 +884,606 @@ def load_weather_data():
         if "wind_gust" in day:
             day["wind_gust_beaufort"] = beaufort(day["wind_gust"])
 
-        app.state.weather_cache[date_str] = day
+        days[date_str] = day
+    app.state.weather_cache = days
+    app.state.weather_last_load = datetime.utcnow()
+    return True
+
 
+def gate_events(
+    threshold: float,
+    method: str = GATE_INTERPOLATION,
+    index: Optional[CrossingIndex] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> dict[str, list]:
+    """Gate raise/lower events for ``threshold``, grouped by local date.
 
-def calculate_gate_times():
-    """Calculate approximate gate raise/lower times from tide heights.
+    ``start`` and ``end`` limit the events to a range of epoch seconds.
 
     The terms "raise" and "lower" in the returned events correspond to the
     physical movement of the gate in Conwy. The gate is **lowered** when the
-    tide rises above ``GATE_OPEN_HEIGHT`` and **raised** again once it falls
-    back below this level.
+    tide rises above the threshold and **raised** again once it falls back
+    below this level.
     """
-    if not app.state.tide_heights_cache:
-        load_tide_heights()
-
-    threshold = GATE_OPEN_HEIGHT
+    index = index or app.state.crossing_index
+    times, rising = index.crossings(threshold, method, start, end)
     events: dict[str, list] = {}
+    for t, up in zip(times.tolist(), rising.tolist()):
+        crossing = to_local(t).isoformat()
+        event = {
+            "datetime": crossing,
+            "action": "lower" if up else "raise",
+            "height": threshold,
+        }
+        events.setdefault(crossing[:10], []).append(event)
+    return events
+
+
+def tide_windows(
+    threshold: float, start: Optional[float] = None, end: Optional[float] = None
+) -> list:
+    """Periods when the tide is at or above ``threshold``.
+
+    ``start`` and ``end`` (epoch seconds) keep the windows opening in that
+    range. Only windows with both ends inside the cached tide heights, and
+    closing within ``WINDOW_MARGIN`` of ``end``, are returned.
+    """
+    # Search past ``end`` for the crossing that closes the last window.
+    search_end = None if end is None else end + WINDOW_MARGIN
+    times, rising = app.state.crossing_index.crossings(threshold, start=start, end=search_end)
+    opens = np.flatnonzero(rising[:-1] & ~rising[1:])
+    if end is not None:
+        opens = opens[times[opens] < end]
+    windows = []
+    for start, end in zip(times[opens].tolist(), times[opens + 1].tolist()):
+        windows.append(
+            {
+                "start": to_local(start).isoformat(),
+                "end": to_local(end).isoformat(),
+                "duration_minutes": round((end - start) / 60),
+            }
+        )
+    return windows
 
-    prev_dt: Optional[datetime] = None
-    prev_height: Optional[float] = None
-
-    for entry in app.state.tide_heights_cache:
-        dt = datetime.fromisoformat(entry["dt"]).astimezone(TZ)
-        height = entry["height"]
-        if prev_dt is not None and prev_height is not None:
-            if prev_height < threshold <= height:
-                ratio = (threshold - prev_height) / (height - prev_height)
-                crossing = prev_dt + (dt - prev_dt) * ratio
-                date_key = crossing.strftime("%Y-%m-%d")
-                event = {
-                    "datetime": crossing.isoformat(),
-                    "action": "lower",
-                    "height": threshold,
-                }
-                events.setdefault(date_key, []).append(event)
-            elif prev_height > threshold >= height:
-                ratio = (prev_height - threshold) / (prev_height - height)
-                crossing = prev_dt + (dt - prev_dt) * ratio
-                date_key = crossing.strftime("%Y-%m-%d")
-                event = {
-                    "datetime": crossing.isoformat(),
-                    "action": "raise",
-                    "height": threshold,
-                }
-                events.setdefault(date_key, []).append(event)
-
-        prev_dt = dt
-        prev_height = height
-
-    app.state.gate_times = events
-
-
-async def refresh_loop():
+
+def time_range(start: Optional[datetime], end: Optional[datetime]) -> tuple[float, float]:
+    """Epoch seconds for a ``start``/``end`` query; naive times are local.
+
+    A missing bound leaves that side of the range open.
+    """
+    bounds = []
+    for value, default in ((start, -np.inf), (end, np.inf)):
+        if value is None:
+            bounds.append(default)
+        else:
+            bounds.append((value if value.tzinfo else value.replace(tzinfo=TZ)).timestamp())
+    if bounds[0] > bounds[1]:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return bounds[0], bounds[1]
+
+
+def day_bounds(date: str) -> tuple[float, float]:
+    """Epoch seconds of local midnight at the start and end of ``date``."""
+    day = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=TZ)
+    return day.timestamp(), (day + timedelta(days=1)).timestamp()
+
+
+def predictable(date: str) -> bool:
+    """Whether ``date`` is within ``PREDICTION_RANGE`` of today."""
+    today = datetime.now(TZ).date()
+    target = datetime.strptime(date, "%Y-%m-%d").date()
+    return abs(target - today) <= PREDICTION_RANGE
+
+
+def predicted_extremes(date: str) -> list:
+    """High and low waters on ``date`` from the harmonic model."""
+    start, end = day_bounds(date)
+    return localise_extremes(app.state.harmonic_model.extremes(start, end))
+
+
+def predicted_gate_events(date: str, threshold: float) -> list:
+    """Gate events on ``date`` from heights predicted every six minutes."""
+    start, end = day_bounds(date)
+    ts = np.arange(start - 3600, end + 3600, 360, dtype=np.int64)
+    index = CrossingIndex(ts, app.state.harmonic_model.predict(ts))
+    return gate_events(threshold, index=index).get(date, [])
+
+
+def calculate_gate_times() -> bool:
+    """Index the tide heights and precompute gate times at ``GATE_OPEN_HEIGHT``.
+
+    Returns False if there are no tide heights to compute them from.
+    """
+    series = app.state.tide_heights_cache
+    if not series:
+        return False
+    app.state.crossing_index = CrossingIndex(series.ts, series.heights)
+    gate_times = gate_events(GATE_OPEN_HEIGHT)
+    # Compressed here, once per refresh, rather than on each request.
+    rendered = {date: Rendered(events).compress() for date, events in gate_times.items()}
+    rendered[""] = Rendered(gate_times).compress()
+    app.state.gate_times, app.state.gate_times_rendered = gate_times, rendered
+    app.state.gate_times_heights = series
+    return True
+
+
+def save_snapshot():
+    """Persist the caches to ``CACHE_DB`` so a restart can start warm."""
+    store = app.state.tide_cache
+    snapshot = {
+        "tide_cache": {"events": store.events, "covered_until": store.covered_until},
+        "tide_heights_cache": {
+            "ts": app.state.tide_heights_cache.ts.tolist(),
+            "heights": app.state.tide_heights_cache.heights.round(3).tolist(),
+            "last_load": app.state.tide_heights_last_load.isoformat(),
+        },
+        "weather_cache": {
+            "days": app.state.weather_cache,
+            "last_load": app.state.weather_last_load.isoformat(),
+        },
+        "harmonic_model": (
+            app.state.harmonic_model.to_dict() if app.state.harmonic_model else None
+        ),
+        "sun_cache": app.state.sun_cache.dump(),
+        "moon_cache": app.state.moon_cache.dump(),
+        "marine_cache": app.state.marine_cache.dump(),
+    }
+    saved_at = datetime.utcnow().isoformat()
+    with sqlite3.connect(CACHE_DB) as db:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot "
+            "(name TEXT PRIMARY KEY, saved_at TEXT, data TEXT)"
+        )
+        db.executemany(
+            "INSERT OR REPLACE INTO snapshot VALUES (?, ?, ?)",
+            [(name, saved_at, json.dumps(data)) for name, data in snapshot.items()],
+        )
+    db.close()
+
+
+def load_snapshot() -> bool:
+    """Restore caches saved by ``save_snapshot``. Returns False if none exist."""
+    if not os.path.exists(CACHE_DB):
+        return False
+    with sqlite3.connect(CACHE_DB) as db:
+        try:
+            rows = db.execute("SELECT name, data FROM snapshot").fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+    db.close()
+    if not rows:
+        return False
+
+    def restore_tides(tides):
+        app.state.tide_cache = TideStore(tides["events"], tides["covered_until"])
+        mark_ready("tides")
+
+    def restore_tide_heights(heights):
+        # Snapshots from before the columnar store are skipped and refetched.
+        if "ts" in heights:
+            last_load = datetime.fromisoformat(heights["last_load"])
+            app.state.tide_heights_cache = TideSeries(heights["ts"], heights["heights"])
+            app.state.tide_heights_last_load = last_load
+            mark_ready("tide_heights")
+
+    def restore_weather(weather):
+        last_load = datetime.fromisoformat(weather["last_load"])
+        app.state.weather_cache = weather["days"]
+        app.state.weather_last_load = last_load
+        mark_ready("weather")
+
+    def restore_model(model):
+        if model:
+            app.state.harmonic_model = HarmonicModel.from_dict(model)
+
+    def restore_ttl_cache(name):
+        def restore(items):
+            # Snapshots written before the caches were bounded hold plain dicts.
+            if isinstance(items, list):
+                getattr(app.state, name).restore(items)
+        return restore
+
+    parts = {
+        "tide_cache": restore_tides,
+        "tide_heights_cache": restore_tide_heights,
+        "weather_cache": restore_weather,
+        "harmonic_model": restore_model,
+        "sun_cache": restore_ttl_cache("sun_cache"),
+        "moon_cache": restore_ttl_cache("moon_cache"),
+        "marine_cache": restore_ttl_cache("marine_cache"),
+    }
+    # A part that cannot be restored is left to the next refresh to fetch
+    # rather than stopping the service from starting.
+    for name, data in rows:
+        if name in parts:
+            try:
+                parts[name](json.loads(data))
+            except Exception as exc:
+                print(f"Skipping {name} from snapshot: {exc!r}")
+    if app.state.tide_heights_cache:
+        try:
+            calculate_gate_times()
+            mark_ready("gate_times")
+        except Exception as exc:
+            print(f"Skipping gate times from snapshot: {exc!r}")
+    return True
+
+
+def mark_ready(name: str):
+    app.state.cache_status[name].update(
+        ready=True, error=None, updated=datetime.utcnow().isoformat()
+    )
+    app.state.generations[name] += 1
+
+
+def require_ready(name: str):
+    """Raise 503 while a cache is still warming up and has nothing to serve."""
+    if not app.state.cache_status[name]["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{name} data is still loading",
+            headers={"Retry-After": str(WARMUP_RETRY_AFTER)},
+        )
+
+
+def error_summary(exc: Exception) -> str:
+    """Describe a failed refresh without the request's query string.
+
+    httpx error messages include the full URL, API key and all, and
+    ``/ready`` shows the error to anyone.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"HTTP {exc.response.status_code} from {exc.request.url.copy_with(query=None)}"
+    if isinstance(exc, httpx.RequestError):
+        return f"{type(exc).__name__} requesting {exc.request.url.copy_with(query=None)}"
+    return type(exc).__name__
+
+
+async def run_loader(name: str, load):
+    """Run a loader, recording its outcome in cache_status.
+
+    Blocking loaders such as ``calculate_gate_times`` run in a worker thread.
+    A loader returning False had nothing to load, so the cache is not marked
+    ready.
+    """
+    status = app.state.cache_status[name]
+    status["loading"] = True
+    app.state.last_attempt[name] = datetime.utcnow()
+    try:
+        if asyncio.iscoroutinefunction(load):
+            loaded = await load()
+        else:
+            loaded = await asyncio.to_thread(load)
+    except Exception as exc:
+        status["error"] = error_summary(exc)
+        detail = status["error"] if isinstance(exc, httpx.HTTPError) else repr(exc)
+        print(f"Refreshing {name} failed: {detail}")
+    else:
+        if loaded is False:
+            status["error"] = "nothing to load"
+        else:
+            mark_ready(name)
+    finally:
+        status["loading"] = False
+
+
+async def single_flight(key: str, fetch):
+    """Await ``fetch()``, sharing one in-flight call between concurrent callers.
+
+    Callers passing the same ``key`` while a call is running wait for that
+    call's result instead of starting another upstream request.
+    """
+    task = app.state.in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        app.state.in_flight[key] = task
+
+        def done(t):
+            if app.state.in_flight.get(key) is t:
+                del app.state.in_flight[key]
+
+        task.add_done_callback(done)
+    # Shielded so one client disconnecting does not cancel the shared fetch.
+    return await asyncio.shield(task)
+
+
+async def refresh_cache(name: str, load):
+    """Refresh a cache; concurrent refreshes of the same cache share one run."""
+    await single_flight(f"refresh:{name}", lambda: run_loader(name, load))
+
+
+def run_in_background(coro):
+    """Schedule ``coro`` without awaiting it, keeping a reference until done."""
+    task = asyncio.create_task(coro)
+    app.state.background_tasks.add(task)
+    task.add_done_callback(app.state.background_tasks.discard)
+
+
+def data_age(loaded: datetime) -> dict:
+    age = datetime.utcnow() - loaded
+    return {"X-Data-Age": str(int(age.total_seconds()))}
+
+
+def conditional_headers(etag: str, max_age: float) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"max-age={max(0, int(max_age))}",
+        # Shared caches must keep each client's authenticated copy apart.
+        "Vary": "Authorization, X-API-KEY",
+    }
+
+
+def cache_headers(name: str, variant: str = "") -> dict:
+    """Validators for data from a refreshed cache, fresh until the next refresh.
+
+    ``variant`` tells apart other representations of the same data.
+    """
+    etag = f'"{name}-{BOOT_ID}-{app.state.generations[name]}{variant}"'
+    return conditional_headers(etag, (app.state.next_refresh - datetime.utcnow()).total_seconds())
+
+
+def entry_headers(namespace: str, entry: tuple, ttl: float) -> dict:
+    """Validators for a ``TTLCache`` entry, fresh until it expires."""
+    stored_at = entry[0]
+    etag = f'"{namespace}-{int(stored_at * 1000)}"'
+    return conditional_headers(etag, stored_at + ttl - time.time())
+
+
+def accept_tokens(value: str) -> list:
+    """Media types or encodings from an Accept-style header, best first.
+
+    Entries with ``q=0`` are dropped.
+    """
+    accepted = []
+    for part in value.split(","):
+        token, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    pass
+        if q > 0 and token.strip():
+            accepted.append((q, token.strip().lower()))
+    return [token for _, token in sorted(accepted, key=lambda a: -a[0])]
+
+
+def negotiate_series(request: Request, format: Optional[str]) -> str:
+    """Pick a ``SERIES_MEDIA_TYPES`` format from ``format`` or the Accept header.
+
+    Anything the client accepts that we cannot produce falls back to JSON.
+    """
+    if format is not None:
+        if format not in SERIES_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown format {format!r}")
+        return format
+    for media in accept_tokens(request.headers.get("accept", "")):
+        fmt = SERIES_FORMATS.get(media)
+        if fmt:
+            return fmt
+    return "json"
+
+
+def render_series(series: TideSeries, fmt: str, start: int, stop: int) -> bytes:
+    """Rows ``start:stop`` of ``series`` as a json, columns or msgpack body."""
+    if fmt == "msgpack":
+        columns = {k: v.tolist() for k, v in series.columns(start, stop).items()}
+        return msgpack.packb(columns, use_single_float=True)
+    if fmt == "columns":
+        return Rendered(series.columns(start, stop)).body
+    return Rendered(series.records(start, stop)).body
+
+
+def etag_matches(request: Request, headers: dict) -> bool:
+    """Whether If-None-Match holds ``headers["ETag"]`` or one of its encodings.
+
+    An encoded copy (see ``EncodingETagMiddleware``) only matches while the
+    request still accepts that encoding. ``headers["ETag"]`` is then set to
+    the matching tag, so a 304 names the representation it validates.
+    """
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    etag = headers["ETag"]
+    encodings = accept_tokens(request.headers.get("accept-encoding", ""))
+    variants = [etag] + [f'{etag[:-1]}-{encoding}"' for encoding in encodings]
+    for tag in tags:
+        if tag in variants:
+            headers["ETag"] = tag
+            return True
+    return False
+
+
+def set_data_age(response: Response, loaded: datetime):
+    response.headers.update(data_age(loaded))
+
+
+def retry_due(name: str) -> bool:
+    """Whether ``REFRESH_RETRY_DELAY`` has passed since ``name`` was last refreshed.
+
+    A failed refresh leaves the cache stale, so without this every request
+    during an upstream outage would spend another fetch.
+    """
+    attempted = app.state.last_attempt.get(name, datetime.min)
+    return datetime.utcnow() - attempted > REFRESH_RETRY_DELAY
+
+
+async def refresh_tide_heights_and_gates():
+    if (
+        not app.state.tide_heights_cache
+        or datetime.utcnow() - app.state.tide_heights_last_load > TIDE_HEIGHTS_MAX_AGE
+    ) and retry_due("tide_heights"):
+        await refresh_cache("tide_heights", load_tide_heights)
+    # Gate times only change when the heights they are computed from do.
+    if app.state.gate_times_heights is not app.state.tide_heights_cache:
+        await refresh_cache("gate_times", calculate_gate_times)
+
+
+async def refresh_weather():
+    if datetime.utcnow() - app.state.weather_last_load > WEATHER_MAX_AGE and retry_due("weather"):
+        await refresh_cache("weather", load_weather_data)
+
+
+async def refresh_caches():
+    """Refresh whatever is stale and persist a snapshot of the result."""
+    await asyncio.gather(
+        refresh_cache("tides", load_tide_data),
+        refresh_weather(),
+        refresh_tide_heights_and_gates(),
+    )
+    try:
+        await asyncio.to_thread(save_snapshot)
+    except Exception as exc:
+        print(f"Saving cache snapshot failed: {exc!r}")
+
+
+async def refresh_loop(delay: float = 0):
     """Background task to refresh caches every 12 hours."""
     while True:
-        await asyncio.to_thread(load_tide_data)
-        await asyncio.to_thread(load_weather_data)
-        if (
-            not app.state.tide_heights_cache
-            or datetime.utcnow() - app.state.tide_heights_last_load > timedelta(days=7)
-        ):
-            await asyncio.to_thread(load_tide_heights)
-        await asyncio.to_thread(calculate_gate_times)
-        await asyncio.sleep(60 * 60 * 12)
+        await asyncio.sleep(delay)
+        await refresh_caches()
+        delay = REFRESH_INTERVAL.total_seconds()
+        app.state.next_refresh = datetime.utcnow() + REFRESH_INTERVAL
 
 
 @app.on_event("startup")
 async def startup_event():
-    await asyncio.to_thread(load_tide_data)
-    await asyncio.to_thread(load_weather_data)
-    await asyncio.to_thread(load_tide_heights)
-    await asyncio.to_thread(calculate_gate_times)
-    asyncio.create_task(refresh_loop())
+    # Anything restored from the snapshot is served straight away; the refresh
+    # loop then fetches only the stale parts in the background.
+    if await asyncio.to_thread(load_snapshot):
+        print(f"Loaded cache snapshot from {CACHE_DB}")
+    if STARTUP_MODE == "blocking":
+        await refresh_caches()
+        app.state.next_refresh = datetime.utcnow() + REFRESH_INTERVAL
+        asyncio.create_task(refresh_loop(REFRESH_INTERVAL.total_seconds()))
+    else:
+        asyncio.create_task(refresh_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if app.state.http_client is not None:
+        await app.state.http_client.aclose()
+
+
+@app.get("/ready")
+def ready():
+    """Report per-cache warm-up status; 503 until every cache has loaded."""
+    status = app.state.cache_status
+    all_ready = all(s["ready"] for s in status.values())
+    return JSONResponse(
+        {"ready": all_ready, "caches": status},
+        status_code=200 if all_ready else 503,
+    )
 
 
+# Handlers below return pre-serialised Responses, so response_model is
+# only used for the schema and no per-item validation runs.
 @app.get("/tides/{date}", response_model=List[TideEvent])
-def tides_for_date(date: str, auth: None = Depends(verify_auth)):
+def tides_for_date(date: str, request: Request, auth: None = Depends(verify_auth)):
     try:
         datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
+    require_ready("tides")
+    headers = cache_headers("tides")
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
 
-    results = [e for e in app.state.tide_cache if e["date"] == date]
+    rendered = app.state.tide_cache.rendered_date(date)
+    if (
+        rendered is None
+        and TIDE_SOURCE == "harmonic"
+        and app.state.harmonic_model
+        and predictable(date)
+    ):
+        predicted = predicted_extremes(date)
+        rendered = Rendered(tide_events(predicted)) if predicted else None
 
-    if not results:
+    if rendered is None:
         raise HTTPException(status_code=404, detail="No tide data for this date")
-    return results
+    return rendered.response(headers, request)
+
+
+@app.get("/tides", response_model=List[TideEvent])
+def tides_between(
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    auth: None = Depends(verify_auth),
+):
+    lo, hi = time_range(start, end)
+    require_ready("tides")
+    headers = cache_headers("tides")
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    return Rendered(tide_events(app.state.tide_cache.between(lo, hi))).response(headers)
 
 
 @app.get("/tide-heights", response_model=List[TideHeight])
-def tide_heights(offset: int = 0, limit: int = 100, auth: None = Depends(verify_auth)):
+async def tide_heights(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: Optional[str] = None,
+    auth: None = Depends(verify_auth),
+):
+    lo, hi = time_range(start, end)
+    fmt = negotiate_series(request, format)
+    require_ready("tide_heights")
+    # Serve what we have; a stale cache is refreshed in the background.
     if (
         not app.state.tide_heights_cache
-        or datetime.utcnow() - app.state.tide_heights_last_load > timedelta(days=7)
+        or datetime.utcnow() - app.state.tide_heights_last_load > TIDE_HEIGHTS_MAX_AGE
     ):
-        load_tide_heights()
-    return app.state.tide_heights_cache[offset : offset + limit]
+        run_in_background(refresh_tide_heights_and_gates())
+    if not app.state.tide_heights_cache:
+        raise HTTPException(
+            status_code=503,
+            detail="Tide heights are being refreshed",
+            headers={"Retry-After": str(WARMUP_RETRY_AFTER)},
+        )
+    headers = cache_headers("tide_heights", "" if fmt == "json" else f"-{fmt}")
+    headers["Vary"] += ", Accept"
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    headers.update(data_age(app.state.tide_heights_last_load))
+    series = app.state.tide_heights_cache
+    ranged = start is not None or end is not None
+    first, last = series.rows(lo, hi) if ranged else (0, len(series))
+    first = min(first + offset, last)
+    # A plain JSON request without a time range gets one page by default.
+    if limit is None and not ranged and fmt == "json":
+        limit = 100
+    stop = last if limit is None else min(last, first + limit)
+    if stop < last:
+        # The next page starts at the next row's time, which unlike an offset
+        # still points at the same row after the series is refreshed.
+        next_url = request.url.remove_query_params("offset").include_query_params(
+            start=iso_local(int(series.ts[stop])), limit=limit
+        )
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    media_type = SERIES_MEDIA_TYPES[fmt]
+    if fmt in ("ndjson", "csv"):
+        # Starlette iterates these generators in its threadpool.
+        rows = getattr(series, fmt)(first, stop)
+        return StreamingResponse(rows, media_type=media_type, headers=headers)
+    # A whole six months takes tens of milliseconds to render, so keep it off
+    # the event loop.
+    body = await asyncio.to_thread(render_series, series, fmt, first, stop)
+    return Response(body, media_type=media_type, headers=headers)
 
 
 @app.get("/weather/{date}", response_model=WeatherDay)
-def weather(date: str, auth: None = Depends(verify_auth)):
+async def weather(
+    date: str, request: Request, response: Response, auth: None = Depends(verify_auth)
+):
     try:
         target = datetime.strptime(date, "%Y-%m-%d").date()
     except ValueError:
@@ -394,16 +1493,31 @@ def weather(date: str, auth: None = Depends(verify_auth)):
         raise HTTPException(
             status_code=404, detail="Weather available only for the next 5 days"
         )
+    require_ready("weather")
+    stale = datetime.utcnow() - app.state.weather_last_load > WEATHER_MAX_AGE
+    if stale:
+        run_in_background(refresh_weather())
     if date not in app.state.weather_cache:
-        load_weather_data()
-    if date not in app.state.weather_cache:
+        if stale:
+            raise HTTPException(
+                status_code=503,
+                detail="Weather data is being refreshed",
+                headers={"Retry-After": str(WARMUP_RETRY_AFTER)},
+            )
         raise HTTPException(status_code=404, detail="Weather data not found")
+    headers = cache_headers("weather")
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    set_data_age(response, app.state.weather_last_load)
     return app.state.weather_cache[date]
 
 
 @app.get("/sunrise-sunset")
-def sunrise_sunset(
+async def sunrise_sunset(
     date: str,
+    request: Request,
+    response: Response,
     lat: float = LAT,
     lng: float = LON,
     auth: None = Depends(verify_auth),
@@ -412,29 +1526,47 @@ def sunrise_sunset(
         datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
+    lat, lng = round(lat, COORD_PRECISION), round(lng, COORD_PRECISION)
     key = f"{lat}:{lng}:{date}"
-    if key not in app.state.sun_cache:
-        app.state.sun_cache[key] = fetch_sunrise_sunset(date, lat, lng)
-    return app.state.sun_cache[key]
+    entry = app.state.sun_cache.entry(key)
+    if entry is None:
+        data = await single_flight(
+            f"sun:{key}", lambda: fetch_sunrise_sunset(date, lat, lng)
+        )
+        entry = app.state.sun_cache.set(key, data)
+    headers = entry_headers("sun", entry, app.state.sun_cache.ttl)
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return entry[1]
 
 
 @app.get("/moon-phase")
-def moon_phase(date: str, auth: None = Depends(verify_auth)):
+async def moon_phase(
+    date: str, request: Request, response: Response, auth: None = Depends(verify_auth)
+):
     try:
         dt = datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
     ts = int(dt.replace(tzinfo=timezone.utc).timestamp())
-    if ts not in app.state.moon_cache:
-        data = fetch_moon_phase(ts)
+    entry = app.state.moon_cache.entry(ts)
+    if entry is None:
+        data = await single_flight(f"moon:{ts}", lambda: fetch_moon_phase(ts))
         if isinstance(data, list) and data:
             data = data[0]
-        app.state.moon_cache[ts] = data
-    return app.state.moon_cache[ts]
+        entry = app.state.moon_cache.set(ts, data)
+    headers = entry_headers("moon", entry, app.state.moon_cache.ttl)
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return entry[1]
 
 
 @app.get("/marine")
-def marine(
+async def marine(
+    request: Request,
+    response: Response,
     forecast_hours: int = 48,
     timeformat: str = "unixtime",
     hourly: str = "sea_level_height_msl,ocean_current_velocity,ocean_current_direction",
@@ -442,25 +1574,105 @@ def marine(
     lon: float = LON,
     auth: None = Depends(verify_auth),
 ):
+    lat, lon = round(lat, COORD_PRECISION), round(lon, COORD_PRECISION)
     key = f"{lat}:{lon}:{hourly}:{timeformat}:{forecast_hours}"
-    if key not in app.state.marine_cache:
-        app.state.marine_cache[key] = fetch_marine_forecast(
-            lat, lon, hourly, timeformat, forecast_hours
+    entry = app.state.marine_cache.entry(key)
+    if entry is None:
+        data = await single_flight(
+            f"marine:{key}",
+            lambda: fetch_marine_forecast(lat, lon, hourly, timeformat, forecast_hours),
         )
-    return app.state.marine_cache[key]
+        entry = app.state.marine_cache.set(key, data)
+    headers = entry_headers("marine", entry, app.state.marine_cache.ttl)
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return entry[1]
+
+
+@app.get("/cache-stats")
+def cache_stats(auth: None = Depends(verify_auth)):
+    return {
+        "sun": app.state.sun_cache.stats(),
+        "moon": app.state.moon_cache.stats(),
+        "marine": app.state.marine_cache.stats(),
+    }
 
 
 @app.get("/gate-times")
-def gate_times_all(auth: None = Depends(verify_auth)):
-    return app.state.gate_times
+def gate_times_all(
+    request: Request,
+    height: Optional[float] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    auth: None = Depends(verify_auth),
+):
+    lo, hi = time_range(start, end)
+    require_ready("gate_times")
+    headers = cache_headers("gate_times")
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    if height is None and start is None and end is None:
+        return app.state.gate_times_rendered[""].response(headers, request)
+    threshold = GATE_OPEN_HEIGHT if height is None else height
+    return Rendered(gate_events(threshold, start=lo, end=hi)).response(headers)
 
 
 @app.get("/gate-times/{date}")
-def gate_times_date(date: str, auth: None = Depends(verify_auth)):
+def gate_times_date(
+    date: str,
+    request: Request,
+    height: Optional[float] = None,
+    auth: None = Depends(verify_auth),
+):
     try:
         datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
-    if date not in app.state.gate_times:
+    require_ready("gate_times")
+    headers = cache_headers("gate_times")
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    if height is None and date in app.state.gate_times_rendered:
+        return app.state.gate_times_rendered[date].response(headers, request)
+    if not predictable(date):
         raise HTTPException(status_code=404, detail="No gate times for this date")
-    return app.state.gate_times[date]
+    start, end = day_bounds(date)
+    if height is not None:
+        events = gate_events(height, start=start, end=end).get(date)
+        if events:
+            return Rendered(events).response(headers)
+    if TIDE_SOURCE == "harmonic" and app.state.harmonic_model:
+        # Only dates outside the cached heights; inside them no events is an answer.
+        ts = app.state.crossing_index.ts
+        if not len(ts) or start > ts[-1] or end < ts[0]:
+            predicted = predicted_gate_events(
+                date, GATE_OPEN_HEIGHT if height is None else height
+            )
+            return Rendered(predicted).response(headers)
+    raise HTTPException(status_code=404, detail="No gate times for this date")
+
+
+@app.get("/tide-windows")
+def tide_windows_for(
+    request: Request,
+    response: Response,
+    height: float = GATE_OPEN_HEIGHT,
+    date: Optional[str] = None,
+    auth: None = Depends(verify_auth),
+):
+    if date is not None:
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format")
+    require_ready("gate_times")
+    headers = cache_headers("gate_times")
+    if etag_matches(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    if date is None:
+        return tide_windows(height)
+    if not predictable(date):
+        return []
+    return tide_windows(height, *day_bounds(date))